@@ -3,16 +3,18 @@ import re
 import base64
 from io import BytesIO
 
-import pandas as pd
-import requests
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup  # new dependency
+# pandas, requests, playwright and bs4 are imported inside the functions that
+# use them so importing this module stays cheap on cold start.
 
 # --- Additional safe enhancements (do not touch existing code) ---
 import os
 
 def debug_csv_from_html(html_content):
     """Check if there's a CSV link and attempt a simple sum."""
+    import pandas as pd
+    import requests
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, "html.parser")
     csv_links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].endswith(('.csv', '.xlsx'))]
     for link in csv_links:
@@ -39,6 +41,8 @@ def debug_chained_url(response_json):
 
 def fetch_page_html_sync(url: str) -> str:
     """Render JS-enabled page and return HTML (Windows-safe)."""
+    from playwright.sync_api import sync_playwright
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
@@ -60,6 +64,10 @@ def log_quiz_debug(html_snippet: str, decoded_snippet: str):
 
 async def solve_quiz(email: str, secret: str, quiz_url: str):
     """Main solver logic."""
+    import pandas as pd
+    import requests
+    from bs4 import BeautifulSoup
+
     loop = asyncio.get_event_loop()
     html = await loop.run_in_executor(None, fetch_page_html_sync, quiz_url)
 
@@ -1,9 +1,13 @@
+from __future__ import annotations
+
 import re
 import io
 import base64
-import httpx
-import pandas as pd
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING
+
+# httpx, pandas and bs4 are imported on first use to keep import time low.
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # ──────────────────────────────────────────────
@@ -27,6 +31,8 @@ async def download_file(url: str) -> bytes:
     """
     Downloads a file (CSV, PDF, JSON, etc.) and returns the content as bytes.
     """
+    import httpx
+
     async with httpx.AsyncClient(follow_redirects=True, timeout=60) as client:
         r = await client.get(url)
         r.raise_for_status()
@@ -40,6 +46,8 @@ def read_csv_bytes(file_bytes: bytes) -> pd.DataFrame:
     """
     Reads CSV content from bytes safely, auto-detecting encoding.
     """
+    import pandas as pd
+
     return pd.read_csv(io.BytesIO(file_bytes))
 
 
@@ -51,7 +59,9 @@ def extract_tables_from_pdf(pdf_bytes: bytes) -> list[pd.DataFrame]:
     Extracts all tables from a PDF file and returns a list of DataFrames.
     Requires pdfplumber.
     """
+    import pandas as pd
     import pdfplumber
+
     tables = []
     with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
         for page in pdf.pages:
@@ -69,6 +79,9 @@ def extract_tables_from_html(html: str) -> list[pd.DataFrame]:
     """
     Extracts all <table> elements from HTML and returns as DataFrames.
     """
+    import pandas as pd
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     tables = []
     for table in soup.find_all("table"):
@@ -120,6 +133,7 @@ def json_safe(obj):
     Converts Numpy/Pandas types to plain Python types for JSON serialization.
     """
     import numpy as np
+    import pandas as pd
 
     if isinstance(obj, (np.integer, int)):
         return int(obj)